@@ -1,12 +1,73 @@
 // imports
-use chrono::Utc;
+use chrono::{DateTime, Utc};
 use chrono::Duration;
+use std::collections::HashSet;
 use std::error::Error;
+use std::fs;
+use std::path::{Path, PathBuf};
+use std::sync::LazyLock;
+use serde::{de::DeserializeOwned, Serialize};
 use time::OffsetDateTime;
 use yahoo_finance_api as yahoo;
 use scraper::{Html, Selector};
+use futures::future::join_all;
 use regex::Regex;
 
+// On-disk cache for network responses
+const CACHE_DIR: &str = ".cache";
+const CACHE_TTL_SECS: i64 = 3600;
+
+fn cache_path(dir: &Path, key: &str) -> PathBuf {
+    dir.join(format!("{}.json", key))
+}
+
+// Read a cached value if it was written within the TTL
+fn read_cache<T: DeserializeOwned>(dir: &Path, key: &str, now: DateTime<Utc>) -> Option<T> {
+    let contents = fs::read_to_string(cache_path(dir, key)).ok()?;
+    let entry: serde_json::Value = serde_json::from_str(&contents).ok()?;
+
+    let fetched_at = entry.get("fetched_at")?.as_i64()?;
+    if now.timestamp() - fetched_at > CACHE_TTL_SECS {
+        return None;
+    }
+
+    serde_json::from_value(entry.get("data")?.clone()).ok()
+}
+
+// Write a value to the cache; failures only cost a refetch next run
+fn write_cache<T: Serialize>(dir: &Path, key: &str, data: &T, now: DateTime<Utc>) {
+    let entry = serde_json::json!({
+        "fetched_at": now.timestamp(),
+        "data": data,
+    });
+
+    if fs::create_dir_all(dir).is_ok() {
+        prune_cache(dir, now);
+        let _ = fs::write(cache_path(dir, key), entry.to_string());
+    }
+}
+
+// Delete entries past the TTL so keys that are never read again don't pile up
+fn prune_cache(dir: &Path, now: DateTime<Utc>) {
+    let Ok(entries) = fs::read_dir(dir) else {
+        return;
+    };
+
+    for entry in entries.flatten() {
+        let path = entry.path();
+        if path.extension().is_none_or(|ext| ext != "json") {
+            continue;
+        }
+        let expired = entry
+            .metadata()
+            .and_then(|metadata| metadata.modified())
+            .is_ok_and(|modified| now.timestamp() - DateTime::<Utc>::from(modified).timestamp() > CACHE_TTL_SECS);
+        if expired {
+            let _ = fs::remove_file(path);
+        }
+    }
+}
+
 // Get the CIK (Central Index Key) for a given stock ticker
 pub fn get_cik(ticker: &str) -> Result<String, Box<dyn Error>> {
     // Read the embedded JSON file
@@ -54,10 +115,7 @@ pub async fn fetch_sec_filings(cik: &str) -> Result<serde_json::Value, Box<dyn E
 }
 
 // Get historical stock price data for a given ticker
-async fn get_stock_history(ticker: &str, days: i64) -> Result<yahoo::YResponse, Box<dyn Error>> {
-    let provider = yahoo::YahooConnector::new()?;
-
-    let end = Utc::now();
+async fn get_stock_history(provider: &yahoo::YahooConnector, ticker: &str, days: i64, end: DateTime<Utc>) -> Result<yahoo::YResponse, Box<dyn Error>> {
     let start = end - Duration::days(days);
 
     println!("Fetching {} days of history for {}", days, ticker);
@@ -77,13 +135,6 @@ async fn get_stock_history(ticker: &str, days: i64) -> Result<yahoo::YResponse,
     Ok(response)
 }
 
-// Get the latest stock quote for a given ticker
-async fn get_latest_quote(ticker: &str) -> Result<yahoo::YResponse, Box<dyn Error>> {
-    let provider = yahoo::YahooConnector::new()?;
-    println!("Fetching latest quote for {}", ticker);
-    provider.get_latest_quotes(ticker, "1d").await.map_err(|e| e.into())
-}
-
 // Parse JSON from SEC filings to extract financial data
 pub fn parse_json(json: &serde_json::Value) -> Vec<Option<f64>> {
     let mut revenue_data = Vec::with_capacity(2);
@@ -205,8 +256,19 @@ pub fn parse_json(json: &serde_json::Value) -> Vec<Option<f64>> {
     revenue_data
 }
 
+// Link selector and redirect pattern for Google's news result page
+static LINK_SELECTOR: LazyLock<Selector> = LazyLock::new(|| Selector::parse("a").unwrap());
+static URL_PATTERN: LazyLock<Regex> = LazyLock::new(|| Regex::new(r"/url\?q=(https://[^&]+)&").unwrap());
+
 // Scrape news articles about a stock
 pub async fn scrape_news(ticker: &str) -> Result<Vec<String>, Box<dyn Error>> {
+    // News moves slowly within a day, so reuse a recent scrape when there is one
+    let now = Utc::now();
+    let cache_key = format!("news-{}", ticker);
+    if let Some(article_texts) = read_cache(Path::new(CACHE_DIR), &cache_key, now) {
+        return Ok(article_texts);
+    }
+
     let search_url = format!("https://www.google.com/search?q={}+stock+news&tbm=nws", ticker);
     
     // Fetch search results
@@ -224,75 +286,129 @@ pub async fn scrape_news(ticker: &str) -> Result<Vec<String>, Box<dyn Error>> {
     let search_doc = Html::parse_document(&search_response);
     
     // Extracting URLs from Google's result page
-    let link_selector = Selector::parse("a")?;
-    let url_pattern = Regex::new(r"/url\?q=(https://[^&]+)&")?;
-
-    let mut article_texts = Vec::with_capacity(5);
     let mut urls = Vec::with_capacity(5);
+    let mut seen = HashSet::with_capacity(5);
 
     // Extract URLs first
-    for element in search_doc.select(&link_selector) {
+    for element in search_doc.select(&LINK_SELECTOR) {
         if let Some(href) = element.value().attr("href") {
-            if let Some(captures) = url_pattern.captures(href) {
-                if let Some(link_match) = captures.get(1) {
-                    let link = link_match.as_str();
-                    urls.push(link.to_string());
-                    
-                    if urls.len() >= 5 {
-                        break;
-                    }
+            if let Some(link) = article_link(href) {
+                // Skip stories already queued under another query string or fragment
+                if !seen.insert(canonical_url(&link)) {
+                    continue;
+                }
+                urls.push(link);
+                
+                if urls.len() >= 5 {
+                    break;
                 }
             }
         }
     }
     
-    // Now scrape each article
-    for url in urls {
+    // Now scrape all articles concurrently over the shared client
+    let results = join_all(urls.iter().map(|url| {
         println!("found element");
-        match scrape_article_text(&url).await {
-            Ok(text) => article_texts.push(text),
-            Err(_) => article_texts.push("Failed to scrape".to_string())
-        }
-    }
+        scrape_article_text(&client, url)
+    }))
+    .await;
+
+    // Only cache complete scrapes so a consent page or failed download is retried next run
+    let complete = !urls.is_empty() && results.iter().all(|result| result.is_ok());
+    let article_texts = results
+        .into_iter()
+        .map(|result| result.unwrap_or_else(|_| "Failed to scrape".to_string()))
+        .collect::<Vec<String>>();
     
+    if complete {
+        write_cache(Path::new(CACHE_DIR), &cache_key, &article_texts, now);
+    }
     Ok(article_texts)
 }
 
+// Target URL of a Google result link, percent-decoded so canonical_url can see its query string
+fn article_link(href: &str) -> Option<String> {
+    let encoded = URL_PATTERN.captures(href)?.get(1)?.as_str();
+    url::form_urlencoded::parse(format!("q={}", encoded).as_bytes())
+        .next()
+        .map(|(_, link)| link.into_owned())
+}
+
+// Canonical form of an article URL without its query string or fragment
+fn canonical_url(link: &str) -> String {
+    match reqwest::Url::parse(link) {
+        Ok(mut url) => {
+            url.set_query(None);
+            url.set_fragment(None);
+            url.to_string()
+        },
+        Err(_) => link.to_lowercase(),
+    }
+}
+
+// Paragraph selector shared by every article parse
+static ARTICLE_SELECTOR: LazyLock<Selector> = LazyLock::new(|| Selector::parse("p").unwrap());
+
 // Scrape the text content from an article
-async fn scrape_article_text(url: &str) -> Result<String, Box<dyn Error>> {
-    let response = reqwest::get(url).await?.text().await?;
-    let document = Html::parse_document(&response);
+async fn scrape_article_text(client: &reqwest::Client, url: &str) -> Result<String, Box<dyn Error>> {
+    let response = client.get(url).send().await?.text().await?;
 
-    // Extracts paragraph text
-    let article_selector = Selector::parse("p")?;  
-    
-    let text = document
-        .select(&article_selector)
-        .map(|el| el.text().collect::<String>())
-        .collect::<Vec<_>>()
-        .join("\n");
+    // Parse on the blocking pool so the other downloads keep making progress
+    let text = tokio::task::spawn_blocking(move || extract_paragraphs(&response)).await?;
     
     println!("done scraping article");
     Ok(text)
 }
 
-// Get market weights for a list of tickers
-pub async fn get_market_weights(tickers: Vec<&str>) -> Result<Vec<f64>, Box<dyn Error>> {
-    let mut market_weights = Vec::with_capacity(tickers.len());
+// Extracts paragraph text from an article's HTML
+fn extract_paragraphs(html: &str) -> String {
+    let document = Html::parse_document(html);
     
-    for ticker in tickers {
-        let response = get_latest_quote(ticker).await?;
-        if let Ok(quotes) = response.quotes() {
-            if let Some(quote) = quotes.first() {
-                market_weights.push(quote.close);
-            } else {
-                market_weights.push(0.0);
-            }
-        } else {
-            market_weights.push(0.0);
-        }
+    document
+        .select(&ARTICLE_SELECTOR)
+        .map(|el| el.text().collect::<String>())
+        .collect::<Vec<_>>()
+        .join("\n")
+}
+
+// Fetch one year of closing prices for each ticker
+pub async fn get_price_histories(tickers: &[&str]) -> Result<Vec<Vec<f64>>, Box<dyn Error>> {
+    let provider = yahoo::YahooConnector::new()?;
+
+    // Every ticker shares one end date and cache timestamp
+    let now = Utc::now();
+
+    // Request every ticker's history concurrently over one connector
+    join_all(tickers.iter().map(|ticker| get_closing_prices(&provider, ticker, 365, now)))
+        .await
+        .into_iter()
+        .collect()
+}
+
+// Get closing prices for a ticker, reusing a fresh on-disk copy when available
+async fn get_closing_prices(provider: &yahoo::YahooConnector, ticker: &str, days: i64, now: DateTime<Utc>) -> Result<Vec<f64>, Box<dyn Error>> {
+    let cache_key = format!("prices-{}-{}", ticker, days);
+    if let Some(prices) = read_cache(Path::new(CACHE_DIR), &cache_key, now) {
+        return Ok(prices);
     }
 
+    let response = get_stock_history(provider, ticker, days, now).await?;
+    let quotes = response
+        .quotes()
+        .map_err(|_| "Failed to get quotes for price history")?;
+    let prices: Vec<f64> = quotes.iter().map(|quote| quote.close).collect();
+
+    write_cache(Path::new(CACHE_DIR), &cache_key, &prices, now);
+    Ok(prices)
+}
+
+// Get market weights from the latest close in each price history
+pub fn get_market_weights(prices: &[Vec<f64>]) -> Vec<f64> {
+    let mut market_weights: Vec<f64> = prices
+        .iter()
+        .map(|price_series| price_series.last().copied().unwrap_or(0.0))
+        .collect();
+
     // Normalize weights
     let total: f64 = market_weights.iter().sum();
     if total > 0.0 {
@@ -302,27 +418,16 @@ pub async fn get_market_weights(tickers: Vec<&str>) -> Result<Vec<f64>, Box<dyn
         }
     }
     
-    Ok(market_weights)
+    market_weights
 }
 
-// Get covariance matrix for a list of tickers
-pub async fn get_covariance_matrix(tickers: Vec<&str>) -> Result<Vec<Vec<f64>>, Box<dyn Error>> {
-    let n = tickers.len();
-    let mut prices = Vec::with_capacity(n);
-    
-    // Fetch historical prices for each ticker
-    for ticker in tickers {
-        let response = get_stock_history(ticker, 365).await?;
-        if let Ok(quotes) = response.quotes() {
-            prices.push(quotes.iter().map(|quote| quote.close).collect::<Vec<f64>>());
-        } else {
-            return Err("Failed to get quotes for covariance calculation".into());
-        }
-    }
+// Get covariance matrix from each ticker's price history
+pub fn get_covariance_matrix(prices: &[Vec<f64>]) -> Vec<Vec<f64>> {
+    let n = prices.len();
 
     // Calculate means
     let mut means = Vec::with_capacity(n);
-    for price_series in &prices {
+    for price_series in prices {
         let sum: f64 = price_series.iter().sum();
         means.push(sum / price_series.len() as f64);
     }
@@ -344,7 +449,7 @@ pub async fn get_covariance_matrix(tickers: Vec<&str>) -> Result<Vec<Vec<f64>>,
         }
     }
 
-    Ok(covariance_matrix)
+    covariance_matrix
 }
 
 // Create an uncertainty matrix for a list of tickers
@@ -358,4 +463,95 @@ pub fn get_uncertainty_matrix(tickers: Vec<&str>) -> Vec<Vec<f64>> {
     }
 
     uncertainty_matrix
-}
\ No newline at end of file
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn canonical_url_strips_query_and_fragment() {
+        assert_eq!(
+            canonical_url("https://example.com/news/story?utm_source=google&id=1#comments"),
+            "https://example.com/news/story"
+        );
+    }
+
+    #[test]
+    fn canonical_url_lowercases_host_but_not_path() {
+        assert_eq!(
+            canonical_url("https://News.Example.COM/Markets/TSLA"),
+            "https://news.example.com/Markets/TSLA"
+        );
+        assert_eq!(
+            canonical_url("https://EXAMPLE.com/a?x=1"),
+            canonical_url("https://example.com/a#top")
+        );
+    }
+
+    #[test]
+    fn canonical_url_falls_back_for_unparseable_links() {
+        assert_eq!(canonical_url("Not A URL"), "not a url");
+    }
+
+    #[test]
+    fn article_link_decodes_encoded_google_redirects() {
+        let href = "/url?q=https://example.com/news/story%3Futm_source%3Dgoogle%26id%3D1%23top&sa=U&ved=abc";
+        let link = article_link(href).unwrap();
+        assert_eq!(link, "https://example.com/news/story?utm_source=google&id=1#top");
+        assert_eq!(canonical_url(&link), "https://example.com/news/story");
+        assert_eq!(
+            canonical_url(&link),
+            canonical_url(&article_link("/url?q=https://example.com/news/story%3Futm_source%3Dyahoo&sa=U").unwrap())
+        );
+    }
+
+    #[test]
+    fn article_link_skips_non_redirect_links() {
+        assert_eq!(article_link("/search?q=TSLA+stock+news"), None);
+        assert_eq!(article_link("/url?q=http://example.com/insecure&sa=U"), None);
+    }
+
+    // Fresh cache directory per test so runs never touch the real .cache
+    fn temp_cache_dir(name: &str) -> PathBuf {
+        let dir = std::env::temp_dir().join(format!("sentivest-{}-{}", name, std::process::id()));
+        let _ = fs::remove_dir_all(&dir);
+        dir
+    }
+
+    #[test]
+    fn read_cache_respects_ttl() {
+        let dir = temp_cache_dir("ttl");
+        let written = Utc::now();
+        write_cache(&dir, "prices", &vec![1.0, 2.0], written);
+
+        let fresh: Option<Vec<f64>> = read_cache(&dir, "prices", written + Duration::seconds(CACHE_TTL_SECS));
+        let expired: Option<Vec<f64>> = read_cache(&dir, "prices", written + Duration::seconds(CACHE_TTL_SECS + 1));
+        let _ = fs::remove_dir_all(&dir);
+
+        assert_eq!(fresh, Some(vec![1.0, 2.0]));
+        assert_eq!(expired, None);
+    }
+
+    #[test]
+    fn read_cache_misses_unknown_key() {
+        let dir = temp_cache_dir("missing");
+        let missing: Option<Vec<f64>> = read_cache(&dir, "unknown", Utc::now());
+        assert_eq!(missing, None);
+    }
+
+    #[test]
+    fn write_cache_prunes_expired_entries() {
+        let dir = temp_cache_dir("prune");
+        let written = Utc::now();
+        write_cache(&dir, "news-OLD", &vec!["story".to_string()], written);
+        write_cache(&dir, "news-NEW", &vec!["story".to_string()], written + Duration::seconds(CACHE_TTL_SECS + 1));
+
+        let old_exists = cache_path(&dir, "news-OLD").exists();
+        let new_exists = cache_path(&dir, "news-NEW").exists();
+        let _ = fs::remove_dir_all(&dir);
+
+        assert!(!old_exists);
+        assert!(new_exists);
+    }
+}
@@ -73,7 +73,7 @@ fn identity_matrix(size: usize) -> Vec<Vec<f64>> {
 }
 
 // Invert a matrix using Gaussian elimination
-fn invert_matrix(matrix: &[Vec<f64>]) -> Option<Vec<Vec<f64>>> {
+pub fn invert_matrix(matrix: &[Vec<f64>]) -> Option<Vec<Vec<f64>>> {
     // Handle empty matrix
     if matrix.is_empty() || matrix[0].is_empty() {
         eprintln!("Empty matrix in inversion");
@@ -165,6 +165,7 @@ fn to_column_vector(vec: &[f64]) -> Vec<Vec<f64>> {
 // Black-Litterman Model Implementation
 pub fn black_litterman(
     sigma: &[Vec<f64>], // Covariance matrix (Σ)
+    sigma_inv: &[Vec<f64>], // Inverse covariance matrix (Σ^-1)
     market_weights: &[f64], // Market capitalization weights (w_m)
     tau: f64, // Small scaling factor
     p: &[Vec<f64>], // Views matrix (P)
@@ -184,6 +185,11 @@ pub fn black_litterman(
         return Vec::new();
     }
     
+    if sigma_inv.len() != n || sigma_inv[0].len() != n {
+        eprintln!("Inverse covariance dimension doesn't match covariance matrix");
+        return Vec::new();
+    }
+    
     if market_weights.len() != n {
         eprintln!("Market weights dimension doesn't match covariance matrix");
         return Vec::new();
@@ -215,14 +221,11 @@ pub fn black_litterman(
         }
     }
     
-    // Calculate inverse of tau*sigma
-    let tau_sigma_inv = match invert_matrix(&tau_sigma) {
-        Some(result) => result,
-        None => {
-            eprintln!("Failed to invert tau*sigma matrix");
-            return Vec::new();
-        }
-    };
+    // Inverse of tau*sigma is the shared sigma inverse scaled by 1/tau
+    let inv_tau = 1.0 / tau;
+    let tau_sigma_inv: Vec<Vec<f64>> = sigma_inv.iter().map(|row| 
+        row.iter().map(|&val| val * inv_tau).collect()
+    ).collect();
     
     // Calculate inverse of omega
     let omega_inv = match invert_matrix(omega) {
@@ -313,29 +316,20 @@ pub fn black_litterman(
 }
 
 // Mean-variance optimization for portfolio allocation
-pub fn mvo(cov: &[Vec<f64>], arv: Vec<f64>) -> Vec<f64> {
+pub fn mvo(cov_inv: &[Vec<f64>], arv: Vec<f64>) -> Vec<f64> {
     // Check if inputs are valid and have compatible dimensions
-    if cov.is_empty() || arv.is_empty() {
+    if cov_inv.is_empty() || arv.is_empty() {
         eprintln!("Empty inputs to MVO");
         return Vec::new();
     }
     
     // Validate dimensions
-    let n = cov.len();
-    if cov[0].len() != n || arv.len() != n {
+    let n = cov_inv.len();
+    if cov_inv[0].len() != n || arv.len() != n {
         eprintln!("Incompatible dimensions in MVO inputs");
         return Vec::new();
     }
     
-    // Calculate inverse of covariance matrix
-    let cov_inv = match invert_matrix(cov) {
-        Some(result) => result,
-        None => {
-            eprintln!("Failed to invert covariance matrix");
-            return Vec::new();
-        }
-    };
-    
     // Calculate optimal weights (more efficient direct calculation)
     let mut weights = vec![0.0; n];
     for i in 0..n {
@@ -353,4 +347,72 @@ pub fn mvo(cov: &[Vec<f64>], arv: Vec<f64>) -> Vec<f64> {
     }
     
     weights
-}
\ No newline at end of file
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    // Small symmetric positive-definite covariance with three assets and two views
+    fn sample_inputs() -> (Vec<Vec<f64>>, Vec<f64>, Vec<Vec<f64>>, Vec<f64>, Vec<Vec<f64>>) {
+        let sigma = vec![
+            vec![0.040, 0.006, 0.004],
+            vec![0.006, 0.025, 0.005],
+            vec![0.004, 0.005, 0.030],
+        ];
+        let market_weights = vec![0.5, 0.3, 0.2];
+        let p = vec![vec![1.0, 0.0, 0.0], vec![0.0, 1.0, -1.0]];
+        let q = vec![0.05, 0.02];
+        let omega = vec![vec![0.01, 0.0], vec![0.0, 0.02]];
+        (sigma, market_weights, p, q, omega)
+    }
+
+    fn assert_close(actual: &[f64], expected: &[f64]) {
+        assert_eq!(actual.len(), expected.len());
+        for (a, e) in actual.iter().zip(expected) {
+            assert!((a - e).abs() < 1e-9, "{} != {}", a, e);
+        }
+    }
+
+    #[test]
+    fn black_litterman_matches_inverting_tau_sigma_directly() {
+        let (sigma, market_weights, p, q, omega) = sample_inputs();
+        let tau = 0.05;
+        let sigma_inv = invert_matrix(&sigma).unwrap();
+        let posterior_mean = black_litterman(&sigma, &sigma_inv, &market_weights, tau, &p, &q, &omega);
+
+        // Previous formulation: invert tau*sigma itself instead of scaling the shared inverse
+        let n = sigma.len();
+        let tau_sigma: Vec<Vec<f64>> = sigma.iter().map(|row| row.iter().map(|&val| val * tau).collect()).collect();
+        let tau_sigma_inv = invert_matrix(&tau_sigma).unwrap();
+        let pi = mat_mult(&tau_sigma, &to_column_vector(&market_weights)).unwrap();
+        let pt_omega_inv = mat_mult(&transpose(&p).unwrap(), &invert_matrix(&omega).unwrap()).unwrap();
+        let mut precision = mat_mult(&pt_omega_inv, &p).unwrap();
+        for i in 0..n {
+            for j in 0..n {
+                precision[i][j] += tau_sigma_inv[i][j];
+            }
+        }
+        let first_term = mat_mult(&tau_sigma_inv, &pi).unwrap();
+        let second_term = mat_mult(&pt_omega_inv, &to_column_vector(&q)).unwrap();
+        let combined: Vec<Vec<f64>> = (0..n).map(|i| vec![first_term[i][0] + second_term[i][0]]).collect();
+        let expected = mat_mult(&invert_matrix(&precision).unwrap(), &combined).unwrap();
+
+        assert_close(&posterior_mean, &expected.iter().map(|row| row[0]).collect::<Vec<_>>());
+    }
+
+    #[test]
+    fn mvo_matches_inverting_covariance_directly() {
+        let (sigma, _, _, _, _) = sample_inputs();
+        let returns = vec![0.04, 0.03, 0.01];
+        let weights = mvo(&invert_matrix(&sigma).unwrap(), returns.clone());
+
+        // Previous formulation: mvo received the covariance and inverted it itself
+        let raw = mat_mult(&invert_matrix(&sigma).unwrap(), &to_column_vector(&returns)).unwrap();
+        let sum: f64 = raw.iter().map(|row| row[0]).sum();
+        let expected: Vec<f64> = raw.iter().map(|row| row[0] / sum).collect();
+
+        assert_close(&weights, &expected);
+        assert!((weights.iter().sum::<f64>() - 1.0).abs() < 1e-12);
+    }
+}
@@ -1,87 +1,150 @@
 use std::error::Error;
 use pyo3::prelude::*;
-use pyo3::types::PyList;
+use futures::future::join_all;
 use std::env;
+use tokio::sync::mpsc;
 
 mod io;
 mod optimizer;
 mod litterman;
 
-fn analyze_sentiment(text: &str) -> PyResult<Vec<f64>> {
-    unsafe {
-        env::set_var("PYTHONPATH", "./src");
+// Texts shorter than this score [0, 0, 0], matching the guard in finbert.py
+const MIN_SENTIMENT_CHARS: usize = 150;
+
+fn analyze_sentiments(texts: &[String]) -> PyResult<Vec<Vec<f64>>> {
+    let mut results = vec![vec![0.0; 3]; texts.len()];
+
+    // Only hand texts long enough to be scored across to Python
+    let keep_idx: Vec<usize> = (0..texts.len())
+        .filter(|&i| texts[i].chars().count() >= MIN_SENTIMENT_CHARS)
+        .collect();
+    if keep_idx.is_empty() {
+        return Ok(results);
     }
-    
-    pyo3::prepare_freethreaded_python();
-    Python::with_gil(|py| {
+    let batch: Vec<&str> = keep_idx.iter().map(|&i| texts[i].as_str()).collect();
+
+    let scores = Python::with_gil(|py| {
         let sentiment_module = PyModule::import(py, "finbert")?;
         let sentiment_class = sentiment_module.getattr("FinBERTSentiment")?.call0()?;
-        let sentiment_result = sentiment_class.getattr("analyze_sentiment")?.call1((text,))?;
+        let sentiment_result = sentiment_class.getattr("analyze_sentiments")?.call1((batch,))?;
 
-        // Convert Python list to Rust Vec<f64>
-        sentiment_result.downcast::<PyList>()?.extract()
-    })
+        // Convert Python list of lists to Rust Vec<Vec<f64>>
+        sentiment_result.extract::<Vec<Vec<f64>>>()
+    })?;
+
+    for (i, score) in keep_idx.into_iter().zip(scores) {
+        results[i] = score;
+    }
+    Ok(results)
+}
+
+// Fetch SEC financials and scraped news articles for a single ticker
+async fn fetch_ticker(ticker: &str) -> (Option<Vec<Option<f64>>>, Option<Vec<String>>) {
+    println!("\n=== Processing {} ===", ticker);
+
+    // Get CIK from local JSON
+    let cik = match io::get_cik(ticker) {
+        Ok(cik) => {
+            println!("CIK for {}: {}", ticker, cik);
+            cik
+        },
+        Err(e) => {
+            println!("Error getting CIK for {}: {}", ticker, e);
+            return (None, None);
+        }
+    };
+
+    // Fetch company data
+    match io::fetch_sec_filings(&cik).await {
+        Ok(company_data) => {
+            let company_data = io::parse_json(&company_data);
+            println!("Company data claimed");
+
+            // Scrape news articles
+            match io::scrape_news(ticker).await {
+                Ok(articles_data) => {
+                    println!("Articles scraped");
+                    (Some(company_data), Some(articles_data))
+                },
+                Err(e) => {
+                    println!("Error scraping news: {}", e);
+                    (Some(company_data), None)
+                }
+            }
+        },
+        Err(e) => {
+            println!("Error fetching SEC filings: {}", e);
+            (None, None)
+        }
+    }
 }
 
 #[tokio::main]
 async fn main() -> Result<(), Box<dyn Error>> {
     let tickers = vec!["TSLA", "AAPL", "MSFT", "GOOGL", "AMZN"];
     let mut company_datas = Vec::with_capacity(tickers.len());
-    let mut articles = Vec::with_capacity(tickers.len());
     let mut sentiments = Vec::with_capacity(tickers.len());
     let mut valid_tickers = Vec::with_capacity(tickers.len());
 
-    // Process each ticker
-    for ticker in &tickers {
-        println!("\n=== Processing {} ===", ticker);
-
-        // Get CIK from local JSON
-        let cik = match io::get_cik(ticker) {
-            Ok(cik) => {
-                println!("CIK for {}: {}", ticker, cik);
-                cik
-            },
-            Err(e) => {
-                println!("Error getting CIK for {}: {}", ticker, e);
-                continue;
+    // Configure Python before any task can call into it
+    unsafe {
+        env::set_var("PYTHONPATH", "./src");
+    }
+    pyo3::prepare_freethreaded_python();
+
+    // Score articles on the blocking pool as each ticker's downloads finish,
+    // batching together every ticker that arrived since the last forward pass
+    let (sender, mut receiver) = mpsc::unbounded_channel::<(usize, Vec<String>)>();
+    let scorer = tokio::task::spawn_blocking(move || {
+        let mut scored = Vec::new();
+        while let Some(first) = receiver.blocking_recv() {
+            let mut ready = vec![first];
+            while let Ok(next) = receiver.try_recv() {
+                ready.push(next);
+            }
+
+            let counts: Vec<(usize, usize)> = ready.iter().map(|(i, texts)| (*i, texts.len())).collect();
+            let texts: Vec<String> = ready.into_iter().flat_map(|(_, texts)| texts).collect();
+            // A failed batch leaves its tickers unscored instead of aborting the run
+            match analyze_sentiments(&texts) {
+                Ok(batch_sentiments) => {
+                    let mut batch_sentiments = batch_sentiments.into_iter();
+                    for (i, count) in counts {
+                        scored.push((i, batch_sentiments.by_ref().take(count).collect::<Vec<Vec<f64>>>()));
+                    }
+                },
+                Err(e) => println!("Error analyzing sentiments: {:?}", e)
+            }
+        }
+        scored
+    });
+
+    // Fetch company data and news for every ticker concurrently
+    let fetched = join_all(tickers.iter().enumerate().map(|(i, ticker)| {
+        let sender = sender.clone();
+        async move {
+            let (company_data, articles_data) = fetch_ticker(ticker).await;
+            if let Some(articles_data) = articles_data {
+                let _ = sender.send((i, articles_data));
+            }
+            company_data
+        }
+    })).await;
+    drop(sender);
+
+    let mut scored: Vec<Option<Vec<Vec<f64>>>> = vec![None; tickers.len()];
+    for (i, sentiment_data) in scorer.await? {
+        scored[i] = Some(sentiment_data);
+    }
+    println!("Sentiments analyzed");
+
+    for ((ticker, company_data), sentiment_data) in tickers.iter().zip(fetched).zip(scored) {
+        if let Some(company_data) = company_data {
+            company_datas.push(company_data);
+            if let Some(sentiment_data) = sentiment_data {
+                sentiments.push(sentiment_data);
+                valid_tickers.push(*ticker);
             }
-        };
-
-        // Fetch company data
-        match io::fetch_sec_filings(&cik).await {
-            Ok(company_data) => {
-                company_datas.push(io::parse_json(&company_data));
-                println!("Company data claimed");
-                
-                // Scrape news articles
-                match io::scrape_news(ticker).await {
-                    Ok(articles_data) => {
-                        articles.push(articles_data.clone());
-                        println!("Articles scraped");
-                        
-                        // Analyze sentiment
-                        match articles_data
-                            .iter()
-                            .map(|article| {
-                                let sentiment = analyze_sentiment(article)?;
-                                println!("Sentiment done");
-                                Ok(sentiment)
-                            })
-                            .collect::<Result<Vec<Vec<f64>>, PyErr>>() {
-                                Ok(sentiment_data) => {
-                                    sentiments.push(sentiment_data);
-                                    println!("Sentiments analyzed");
-                                    valid_tickers.push(*ticker);
-                                },
-                                Err(e) => {
-                                    println!("Error analyzing sentiments: {:?}", e);
-                                }
-                            }
-                    },
-                    Err(e) => println!("Error scraping news: {}", e)
-                }
-            },
-            Err(e) => println!("Error fetching SEC filings: {}", e)
         }
     }
 
@@ -126,14 +189,19 @@ async fn main() -> Result<(), Box<dyn Error>> {
     let q_values = optimizer::get_qviews(values);
 
     // Get market data
-    let market_weights = io::get_market_weights(sorted_tickers.clone()).await?;
-    let sigma = io::get_covariance_matrix(sorted_tickers.clone()).await?;
+    let prices = io::get_price_histories(&sorted_tickers).await?;
+    let market_weights = io::get_market_weights(&prices);
+    let sigma = io::get_covariance_matrix(&prices);
     let omega = io::get_uncertainty_matrix(sorted_tickers.clone());
 
+    // Invert the covariance once and share it between Black-Litterman and MVO
+    let sigma_inv = litterman::invert_matrix(&sigma).ok_or("Failed to invert covariance matrix")?;
+
     // Run Black-Litterman model
     let tau = 0.025;
     let posterior_mean = litterman::black_litterman(
         &sigma, 
+        &sigma_inv, 
         &market_weights, 
         tau, 
         &p_values, 
@@ -143,7 +211,7 @@ async fn main() -> Result<(), Box<dyn Error>> {
 
     println!("Posterior mean: {:?}", posterior_mean);
 
-    let updated_weights = litterman::mvo(&sigma, posterior_mean);
+    let updated_weights = litterman::mvo(&sigma_inv, posterior_mean);
     for i in 0..sorted_tickers.len() {
         println!("{}: {:.2}%", sorted_tickers[i], updated_weights[i] * 100.0);
     }
@@ -32,19 +32,14 @@ pub fn aggregate_sentiment(sentiments: Vec<Vec<f64>>) -> Vec<f64> {
         return Vec::new();
     }
     
-    let len = sentiments.len() as f64;
-    let mut result = vec![0.0; 3];
+    // Accumulate into a fixed-size array so the loop stays bounds-check free
+    let inv_len = 1.0 / sentiments.len() as f64;
+    let totals = sentiments
+        .iter()
+        .filter_map(|sentiment| sentiment.get(..3))
+        .fold([0.0; 3], |acc, s| [acc[0] + s[0], acc[1] + s[1], acc[2] + s[2]]);
     
-    for sentiment in sentiments {
-        if sentiment.len() >= 3 {
-            result[0] += sentiment[0];
-            result[1] += sentiment[1];
-            result[2] += sentiment[2];
-        }
-    }
-    
-    result.iter_mut().for_each(|val| *val /= len);
-    result
+    totals.iter().map(|total| total * inv_len).collect()
 }
 
 pub fn sentiment_returns(sentiments: Vec<Vec<f64>>) -> Vec<f64> {
@@ -0,0 +1,164 @@
+import os
+import shelve
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import finbert
+from finbert import MODEL_NAME, FinBERTSentiment, SemanticCache, _cache_key, _max_probability_diff, _quantize
+
+
+class FakeTokenizer:
+    # One token per word, padded with zeros to the longest text in the call
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=True, max_length=512):
+        ids = [[1] * min(len(text.split()), max_length) for text in texts]
+        if return_tensors is None:
+            return {"input_ids": ids}
+        width = max(len(row) for row in ids)
+        input_ids = torch.tensor([row + [0] * (width - len(row)) for row in ids])
+        return {"input_ids": input_ids, "attention_mask": (input_ids != 0).long()}
+
+
+class FakeOutput:
+    def __init__(self, logits):
+        self.logits = logits
+
+
+class FakeModel:
+    # Logits encode each text's own token count, so results can be traced back to their input
+    def __call__(self, input_ids, attention_mask):
+        lengths = attention_mask.sum(dim=-1).float()
+        return FakeOutput(torch.stack([lengths / 10, torch.zeros_like(lengths), -lengths / 10], dim=-1))
+
+
+def make_finbert(bucket_size):
+    finbert = FinBERTSentiment.__new__(FinBERTSentiment)
+    finbert.tokenizer = FakeTokenizer()
+    finbert.model = FakeModel()
+    finbert.device = torch.device("cpu")
+    finbert.bucket_size = bucket_size
+    return finbert
+
+
+def expected_probs(text):
+    length = float(len(text.split()))
+    logits = torch.tensor([length / 10, 0.0, -length / 10])
+    return torch.nn.functional.softmax(logits, dim=-1).tolist()
+
+
+@pytest.mark.parametrize("bucket_size", [1, 2, 3, 8])
+def test_infer_returns_results_in_input_order(bucket_size):
+    word_counts = [40, 3, 17, 3, 90, 1, 25, 60, 8]
+    texts = [" ".join(["word"] * count) for count in word_counts]
+
+    results = make_finbert(bucket_size)._infer(texts)
+
+    assert len(results) == len(texts)
+    for text, probs in zip(texts, results):
+        assert probs == pytest.approx(expected_probs(text))
+
+
+def make_cached_finbert(tmp_path, backend="torch-int8", cache_size=10000):
+    model = make_finbert(bucket_size=8)
+    model.backend = backend
+    model.cache_path = str(tmp_path / "sentiment_cache")
+    model.cache_size = cache_size
+    model.semantic_threshold = None
+    return model
+
+
+def article(word):
+    # Long enough to clear the 150 character minimum
+    return " ".join([word] * 40)
+
+
+def test_cache_evicts_least_recently_used_first(tmp_path, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(finbert.time, "time", lambda: float(next(clock)))
+    model = make_cached_finbert(tmp_path, cache_size=2)
+
+    model.analyze_sentiments([article("alpha")])
+    model.analyze_sentiments([article("beta")])
+    model.analyze_sentiments([article("alpha")])  # cache hit refreshes alpha's last use
+    model.analyze_sentiments([article("gamma")])
+
+    with shelve.open(model.cache_path) as cache:
+        assert set(cache) == {_cache_key(article("alpha"), "torch-int8"), _cache_key(article("gamma"), "torch-int8")}
+
+
+def test_cache_evicts_old_format_entries_first(tmp_path):
+    model = make_cached_finbert(tmp_path, cache_size=2)
+    with shelve.open(model.cache_path) as cache:
+        cache["legacy"] = [0.1, 0.2, 0.7]
+        cache[_cache_key(article("alpha"), "torch-int8")] = ([0.2, 0.3, 0.5], 1.0)
+
+    model.analyze_sentiments([article("beta")])
+
+    with shelve.open(model.cache_path) as cache:
+        assert "legacy" not in cache
+        assert len(cache) == 2
+
+
+def test_cache_keeps_backends_apart(tmp_path):
+    text = article("alpha")
+    make_cached_finbert(tmp_path, backend="torch-int8").analyze_sentiments([text])
+    make_cached_finbert(tmp_path, backend="onnx-int8").analyze_sentiments([text])
+
+    with shelve.open(str(tmp_path / "sentiment_cache")) as cache:
+        assert set(cache) == {_cache_key(text, "torch-int8"), _cache_key(text, "onnx-int8")}
+
+
+def test_int8_quantization_stays_within_1e_2_of_fp32():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+        fp32_model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).eval()
+    except OSError as e:
+        pytest.skip(f"FinBERT weights unavailable: {e}")
+
+    assert _max_probability_diff(tokenizer, fp32_model, _quantize(fp32_model)) < 1e-2
+
+
+def make_semantic_cache(vectors):
+    # Stub embed: each text maps to a fixed direction, near-duplicates point almost the same way
+    cache = SemanticCache.__new__(SemanticCache)
+    cache.threshold = 0.95
+    cache.embeddings = torch.empty(0, 4)
+    cache.scores = []
+    cache.embed = lambda texts: torch.nn.functional.normalize(torch.tensor([vectors[text] for text in texts]), dim=-1)
+    return cache
+
+
+def test_semantic_cache_resolve_reuses_index_and_batch_duplicates():
+    vectors = {
+        "a": [1.0, 0.0, 0.0, 0.0],
+        "a-copy": [1.0, 0.05, 0.0, 0.0],
+        "b": [0.0, 1.0, 0.0, 0.0],
+        "b-copy": [0.0, 1.0, 0.05, 0.0],
+        "c": [0.0, 0.0, 1.0, 0.0],
+        "d": [0.0, 0.0, 0.0, 1.0],
+        "d-copy": [0.05, 0.0, 0.0, 1.0],
+    }
+    cache = make_semantic_cache(vectors)
+    calls = []
+
+    def infer(batch):
+        calls.append(batch)
+        return [[float(len(calls)), float(i), 0.0] for i in range(len(batch))]
+
+    # Within-batch duplicate shares the first copy's forward pass
+    results, unique = cache.resolve(["a", "b", "a-copy", "c"], infer)
+    assert calls == [["a", "b", "c"]]
+    assert unique == [0, 1, 3]
+    assert results == [[1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [1.0, 0.0, 0.0], [1.0, 2.0, 0.0]]
+
+    # Indexed near-duplicates are served without inference, only new texts are inferred
+    results, unique = cache.resolve(["b-copy", "d", "d-copy"], infer)
+    assert calls[1:] == [["d"]]
+    assert unique == [1]
+    assert results == [[1.0, 1.0, 0.0], [2.0, 0.0, 0.0], [2.0, 0.0, 0.0]]